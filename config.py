@@ -1,20 +1,60 @@
-import json
+import atexit
 import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
+from typing import Any, TypedDict
+
+import orjson
+
+
+class SMAConfig(TypedDict):
+    """Settings for the SMA-with-threshold strategy."""
+
+    window: int
+    upper_threshold: float
+    lower_threshold: float
+    cooldowns: dict[str, Any]
+
+
+class AppConfig(TypedDict, total=False):
+    """Shape of config/config.json."""
+
+    datadir: str
+    notifications: str
+    log_level: str
+    symbols: dict[str, str]
+    mailing_list: list[str]
+    sma: SMAConfig
+
 
 CONFIG_PATH = Path(__file__).parent / "config" / "config.json"
-with open(CONFIG_PATH, "r") as f:
-    config = json.load(f)
+with open(CONFIG_PATH, "rb") as f:
+    config: AppConfig = orjson.loads(f.read())
 
-# Configure logging to match Gunicorn/Uvicorn format
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(process)d] [%(levelname)s] - %(message)s",
+# Configure logging to match Gunicorn/Uvicorn format. Records are queued and
+# written by a listener thread so file/stream I/O stays off the event loop.
+_formatter = logging.Formatter(
+    "%(asctime)s [%(process)d] [%(levelname)s] - %(message)s",
     datefmt="%Y-%m-%d %H:%M:%S %z",
-    handlers=[
-        logging.FileHandler("market_server.log"),
-        logging.StreamHandler(),
-    ],
+)
+_handlers: list[logging.Handler] = [
+    logging.FileHandler("market_server.log"),
+    logging.StreamHandler(),
+]
+for _handler in _handlers:
+    _handler.setFormatter(_formatter)
+
+_log_queue: queue.SimpleQueue = queue.SimpleQueue()
+_log_listener = QueueListener(_log_queue, *_handlers, respect_handler_level=True)
+_log_listener.start()
+atexit.register(_log_listener.stop)
+
+_queue_handler = QueueHandler(_log_queue)
+_queue_handler.setFormatter(logging.Formatter("%(message)s"))
+logging.basicConfig(
+    level=config.get("log_level", "INFO"),
+    handlers=[_queue_handler],
 )
 
 logger = logging.getLogger(__name__)
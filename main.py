@@ -6,11 +6,12 @@ import pandas as pd
 from fastapi import (Depends, FastAPI, HTTPException, Query, WebSocket,
                      WebSocketDisconnect, status)
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
 from pydantic import BaseModel
 
-from config import config, logger
+from config import logger
 from market_manager import manager
-from sma200.utils import format_analytics_payload, market_is_open
+from sma200.utils import market_is_open
 
 origins = ["https://invest.mhuber.dev"]
 
@@ -44,7 +45,7 @@ async def get_market_server(
     symbol: Annotated[str, Query(description="e.g. ^GSPC")]
 ):
     try:
-        server = await manager.get_server(symbol)
+        server = manager.get_server(symbol)
     except KeyError as exc:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -61,78 +62,52 @@ async def get_market_server(
 @app.get("/history")
 async def get_history(
     server=Depends(get_market_server)
-) -> list[dict]:
-    df = server.data.copy()
-    df.index = df.index.strftime("%Y-%m-%d")
-    df = df.reset_index().rename(columns={"index": "Date"})
-    return df.to_dict(orient="records")
+) -> Response:
+    return Response(content=server.history_json(), media_type="application/json")
 
 @app.get("/symbols", response_model=list[SymbolResponse])
 async def get_all_symbols():
-    servers = await manager.get_all_servers()
-    if not servers:
+    if manager.symbols_json is None:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE, 
             detail="No market servers available"
         )
-    name_map = config.get("symbols", {})
-    return [
-        SymbolResponse(
-            value=server.symbol, 
-            label=name_map.get(server.symbol, server.symbol)
-        )
-        for server in servers
-    ]
+    return Response(content=manager.symbols_json, media_type="application/json")
 
 @app.get("/strategies", response_model=list[StrategyResponse])
 async def get_all_strategies():
-    servers = await manager.get_all_servers()
-    if not servers:
+    if manager.symbols_json is None:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE, 
             detail="No market servers available"
         )
-    strategies = servers[0].analytics.get_all_strategies()
-    if not strategies:
+    if manager.strategies_json is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, 
             detail="No strategies found"
         )
-    return [
-        StrategyResponse(value=internal, label=human)
-        for internal, human in strategies
-    ]
+    return Response(content=manager.strategies_json, media_type="application/json")
 
 @app.get("/analytics/{strat}")
 async def analytics_rest(
     strat: str,
     server=Depends(get_market_server),
-) -> dict:
+) -> Response:
     if not server.analytics.exists(strat):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, 
             detail=f"Strategy '{strat}' not configured or loaded"
         )
-        
-    df = server.data.copy()
-    
+
     try:
-        result, _ = server.analytics.execute(
-            strat, df, server.symbol, streaming_update=False
-        )
+        payload = server.analytics_json(strat, drop_last=market_is_open())
     except Exception as exc:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, 
             detail=f"Error running strategy '{strat}': {exc}"
         )
 
-    if market_is_open():
-        ts = result.get("time_series", {})
-        result["time_series"] = {
-            k: v[:-1] for k, v in ts.items() if isinstance(v, list)
-        }
-
-    return format_analytics_payload(server.symbol, strat, result)
+    return Response(content=payload, media_type="application/json")
 
 @app.websocket("/ws/live")
 async def intraday_data_ws(
@@ -141,7 +116,7 @@ async def intraday_data_ws(
 ) -> None:
     pool_name = "live"
     try:
-        server = await manager.get_server(symbol)
+        server = manager.get_server(symbol)
     except KeyError:
         logger.warning(f"Symbol '{symbol}' not found. Closing connection.")
         await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=f"Symbol '{symbol}' not available")
@@ -166,7 +141,7 @@ async def analytics_ws(
 ) -> None:
     pool_name = f"analytics-{strat}"
     try:
-        server = await manager.get_server(symbol)
+        server = manager.get_server(symbol)
     except KeyError:
         logger.warning(f"Symbol '{symbol}' not found. Closing connection.")
         await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=f"Symbol '{symbol}' not configured")
@@ -1,7 +1,15 @@
 from __future__ import annotations
 
+import asyncio
+from pathlib import Path
+from types import MappingProxyType
+from typing import Mapping
+
+import orjson
+
 from config import config
 from market_server import MarketServer
+from sma200.data import migrate_legacy_caches, refresh_interday_data
 
 
 class MarketManager:
@@ -9,31 +17,78 @@ class MarketManager:
 
     def __init__(self) -> None:
         self._symbols_to_preload: list[str] = list(config.get("symbols", {}).keys())
-        self._servers: dict[str, MarketServer] = {}
+        self._servers: Mapping[str, MarketServer] = MappingProxyType({})
+        self._symbols_json: bytes | None = None
+        self._strategies_json: bytes | None = None
+        self._refresh_task: asyncio.Task | None = None
 
-    async def _create_server(self, symbol: str) -> MarketServer:
+    async def _create_server(
+        self, symbol: str, initial_refresh: asyncio.Future | None = None
+    ) -> MarketServer:
         """Create and start a MarketServer for the given symbol."""
-        server = MarketServer(symbol, config)
+        server = MarketServer(symbol, config, initial_refresh)
         server.start()
-        self._servers[symbol] = server
+        self._servers = MappingProxyType({**self._servers, symbol: server})
         return server
 
     async def initialize_all_servers(self) -> None:
         """Initialize all configured servers at startup."""
-        for symbol in self._symbols_to_preload:
-            if symbol not in self._servers:
-                await self._create_server(symbol)
+        pending = [s for s in self._symbols_to_preload if s not in self._servers]
+        data_dir = Path(config["datadir"])
+        # Local and quick; done first so the servers and the refresh below
+        # never convert the same file at once.
+        await asyncio.to_thread(migrate_legacy_caches, pending, data_dir)
+        # Servers start on their cached data right away. Stale caches are
+        # downloaded in the background in batched requests, and each server
+        # picks up its frame instead of downloading on its own.
+        self._refresh_task = asyncio.create_task(
+            asyncio.to_thread(refresh_interday_data, pending, data_dir)
+        )
+        for symbol in pending:
+            await self._create_server(symbol, self._refresh_task)
+        self._snapshot_catalog()
+
+    def _snapshot_catalog(self) -> None:
+        """Pre-encode the symbol and strategy listings served by the API."""
+        servers = list(self._servers.values())
+        name_map = config.get("symbols", {})
+        symbols = [
+            {"value": s.symbol, "label": name_map.get(s.symbol, s.symbol)}
+            for s in servers
+        ]
+        strategies = [
+            {"value": internal, "label": human}
+            for internal, human in (
+                servers[0].analytics.get_all_strategies() if servers else []
+            )
+        ]
+        self._symbols_json = orjson.dumps(symbols) if symbols else None
+        self._strategies_json = orjson.dumps(strategies) if strategies else None
 
-    async def get_server(self, symbol: str) -> MarketServer:
+    @property
+    def symbols_json(self) -> bytes | None:
+        """Encoded /symbols listing, or None if no servers are registered."""
+        return self._symbols_json
+
+    @property
+    def strategies_json(self) -> bytes | None:
+        """Encoded /strategies listing, or None if no strategies are registered."""
+        return self._strategies_json
+
+    def get_server(self, symbol: str) -> MarketServer:
         """Return the MarketServer associated with the given symbol."""
         return self._servers[symbol]
 
-    async def get_all_servers(self) -> list[MarketServer]:
-        """Return all MarketServers currently registered."""
-        return list(self._servers.values())
-
     async def stop_all(self) -> None:
         """Stop all active servers cleanly."""
+        if self._refresh_task and not self._refresh_task.done():
+            # The worker thread finishes its current request on its own;
+            # nothing waits for or adopts the result any more.
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
         for server in self._servers.values():
             await server.stop()
 
@@ -1,34 +1,54 @@
 import asyncio
-import json
-from datetime import date, datetime
+import logging
+from datetime import date, datetime, time, timedelta
 from pathlib import Path
 
+import orjson
 import pandas as pd
 from fastapi import WebSocket
 
 from config import logger
 from sma200.analytics import Analytics
-from sma200.data import get_interday_data, get_intraday_datapoint
+from sma200.data import (
+    adjustment_factor,
+    get_interday_data,
+    get_intraday_datapoint,
+)
 from sma200.io import (
-    archive_csv,
-    get_symbol_csv_path,
+    archive_symbol_data,
+    get_symbol_data_path,
     load_interday_data,
     save_interday_data,
+    sync_interday_data,
 )
 from sma200.notifications import Notifier
 from sma200.utils import (
     EASTERN,
+    drop_last_bar,
     format_analytics_payload,
     is_consecutive_trading_day,
     is_trading_day,
     market_is_open,
+    market_is_open_at,
+    next_market_open,
 )
 
 
 class MarketServer:
     """Handles market data updates and WebSocket broadcasting."""
 
-    def __init__(self, symbol: str, config: dict) -> None:
+    # Intraday ticks kept in memory only before the data file is rewritten.
+    PERSIST_EVERY_TICKS = 15
+    # Clients sent to per event-loop pass when broadcasting to a pool.
+    BROADCAST_BATCH_SIZE = 50
+    ANALYTICS_POOL_PREFIX = "analytics-"
+
+    def __init__(
+        self,
+        symbol: str,
+        config: dict,
+        initial_refresh: asyncio.Future | None = None,
+    ) -> None:
         self.symbol = symbol
         self.data_dir = Path(config["datadir"])
         self.stale_dir = self.data_dir / "stale"
@@ -38,7 +58,18 @@ class MarketServer:
         self.current_day: date | None = None
         self._running = False
         self._task: asyncio.Task | None = None
+        self._persist_task: asyncio.Task | None = None
+        # Shared batch download started by MarketManager, if any; resolves to
+        # frames keyed by symbol.
+        self._initial_refresh = initial_refresh
         self._ws_pools: dict[str, set[WebSocket]] = {}
+        # Analytics pools keyed by strategy name; the sets are shared with
+        # _ws_pools so registration and pruning apply to both.
+        self._analytics_pools: dict[str, set[WebSocket]] = {}
+        self._history_bytes: bytes | None = None
+        self._history_prefix: tuple[int, bytes] | None = None
+        self._analytics_bytes: dict[tuple[str, bool], bytes] = {}
+        self._unsaved_ticks = 0
 
         self.analytics = Analytics(config)
         self.notifier = Notifier(config, symbol)
@@ -46,7 +77,12 @@ class MarketServer:
     # WebSocket Management
     def register_websocket(self, pool_name: str, ws: WebSocket) -> None:
         """Register a WebSocket connection under a named pool."""
-        self._ws_pools.setdefault(pool_name, set()).add(ws)
+        pool = self._ws_pools.setdefault(pool_name, set())
+        pool.add(ws)
+        if pool_name.startswith(self.ANALYTICS_POOL_PREFIX):
+            strategy = pool_name.removeprefix(self.ANALYTICS_POOL_PREFIX)
+            if self.analytics.exists(strategy):
+                self._analytics_pools.setdefault(strategy, pool)
 
     def unregister_websocket(self, pool_name: str, ws: WebSocket) -> None:
         """Remove a WebSocket from its pool, if present."""
@@ -55,11 +91,22 @@ class MarketServer:
 
     async def push_update(self, pool_name: str, payload: str) -> None:
         """Send a message to all WebSockets in the specified pool."""
-        if not (pool := self._ws_pools.get(pool_name)):
+        if pool := self._ws_pools.get(pool_name):
+            await self._send_to_pool(pool, payload)
+
+    async def _send_to_pool(self, pool: set[WebSocket], payload: str) -> None:
+        """Send a message to every WebSocket in `pool`, dropping failed ones."""
+        if not pool:
             return
 
-        disconnected = {ws for ws in pool if not await self._safe_send(ws, payload)}
-        pool -= disconnected
+        clients = list(pool)
+        size = self.BROADCAST_BATCH_SIZE
+        for start in range(0, len(clients), size):
+            if start:
+                await asyncio.sleep(0)  # let other tasks run between batches
+            batch = clients[start : start + size]
+            sent = await asyncio.gather(*(self._safe_send(ws, payload) for ws in batch))
+            pool.difference_update(ws for ws, ok in zip(batch, sent) if not ok)
 
     @staticmethod
     async def _safe_send(ws: WebSocket, payload: str) -> bool:
@@ -70,14 +117,105 @@ class MarketServer:
         except Exception:
             return False
 
+    # Cached Payloads
+    def history_json(self) -> bytes:
+        """Return the interday history as JSON, encoded once per data change.
+
+        Rows before the last one are encoded once and reused while only the
+        last (intraday) row changes, so a tick re-encodes a single record.
+        """
+        if self._history_bytes is None:
+            settled = len(self.data) - 1
+            if self._history_prefix is None or self._history_prefix[0] != settled:
+                encoded = orjson.dumps(self._history_records(self.data.iloc[:-1]))
+                self._history_prefix = (settled, encoded)
+            prefix = self._history_prefix[1]
+            last = orjson.dumps(self._history_records(self.data.iloc[-1:]))
+            if prefix == b"[]" or last == b"[]":
+                self._history_bytes = last if prefix == b"[]" else prefix
+            else:
+                self._history_bytes = prefix[:-1] + b"," + last[1:]
+        return self._history_bytes
+
+    @staticmethod
+    def _history_records(df: pd.DataFrame) -> list[dict]:
+        """Convert OHLCV rows to /history records, one column at a time."""
+        keys = ("Date", *df.columns)
+        columns = [df.index.strftime("%Y-%m-%d").tolist()]
+        columns += [df[col].tolist() for col in df.columns]
+        return [dict(zip(keys, row)) for row in zip(*columns)]
+
+    def analytics_json(self, strategy: str, drop_last: bool = False) -> bytes:
+        """Return the encoded analytics payload, computed once per data change."""
+        key = (strategy, drop_last)
+        if (payload := self._analytics_bytes.get(key)) is None:
+            # Strategies treat the frame as read-only, so no defensive copy.
+            result, _ = self.analytics.execute(
+                strategy, self.data, self.symbol, streaming_update=False
+            )
+            if drop_last:
+                drop_last_bar(result)
+            payload = orjson.dumps(
+                format_analytics_payload(self.symbol, strategy, result),
+                option=orjson.OPT_SERIALIZE_NUMPY,
+            )
+            self._analytics_bytes[key] = payload
+        return payload
+
+    def _mark_data_changed(self, last_row_only: bool = False) -> None:
+        """Drop cached payloads derived from the in-memory data.
+
+        `last_row_only` signals that every row but the last is unchanged, so
+        the encoded history prefix stays valid.
+        """
+        self._history_bytes = None
+        if not last_row_only:
+            self._history_prefix = None
+            self.analytics.reset()
+        self._analytics_bytes.clear()
+
     # Lifecycle Control
     async def startup(self) -> None:
         """Load initial interday market data."""
         logger.info(f"[{self.symbol}] Loading interday data...")
-        self.data = load_interday_data(self.symbol, self.data_dir)
+        self.data = self._sorted(
+            await asyncio.to_thread(load_interday_data, self.symbol, self.data_dir)
+        )
+        self._mark_data_changed()
         self.current_day = self._last_trading_day_from_data()
         logger.info(f"[{self.symbol}] Startup complete. Last day: {self.current_day}")
 
+    async def _adopt_initial_refresh(self) -> None:
+        """Switch to the manager's freshly downloaded data, if there is one.
+
+        On a trading day that download fetched every stale symbol and every
+        cache that may hold intraday rows, so today's day check does not need
+        to fetch the symbol again.
+        """
+        if self._initial_refresh is None:
+            return
+        try:
+            # Shielded: the download is shared with the other servers.
+            frames = await asyncio.shield(self._initial_refresh)
+        except Exception as exc:
+            logger.warning(f"[{self.symbol}] Startup refresh failed: {exc}")
+            return
+        finally:
+            self._initial_refresh = None
+
+        data = frames.get(self.symbol)
+        if data is None or data.empty:
+            return
+        self.data = self._sorted(data)
+        self._mark_data_changed()
+        today = datetime.now(EASTERN).date()
+        if is_trading_day(today):
+            self.current_day = today
+        else:
+            self.current_day = self._last_trading_day_from_data()
+        logger.info(f"[{self.symbol}] Refresh complete. Last day: {self.current_day}")
+        await self._daily_checkpoint()
+
     def start(self) -> None:
         """Start the background market data update loop."""
         if self._running:
@@ -101,27 +239,49 @@ class MarketServer:
             except asyncio.CancelledError:
                 pass
 
+        await self._flush_unsaved_ticks()
         logger.info(f"[{self.symbol}] Server stopped.")
 
     async def _run_loop(self) -> None:
         """Main event loop: check day transitions and push intraday updates."""
         await self.startup()
+        await self._adopt_initial_refresh()
         logger.info(f"[{self.symbol}] Entering main loop...")
 
         while self._running:
             try:
-                await self._check_new_trading_day()
-                await self._fetch_intraday_update()
-                await asyncio.sleep(60)
+                today = datetime.now(EASTERN).date()
+                await self._check_new_trading_day(today)
+                await self._fetch_intraday_update(today=today)
+                await asyncio.sleep(self._seconds_until_next_event())
             except asyncio.CancelledError:
                 break
             except Exception as exc:
                 logger.exception(f"[{self.symbol}] Error in loop: {exc}")
                 await asyncio.sleep(60)
 
-    def _get_csv_path(self) -> Path:
-        """Return the canonical CSV file path for this symbol."""
-        return get_symbol_csv_path(self.data_dir, self.symbol)
+    @staticmethod
+    def _seconds_until_next_event() -> float:
+        """Seconds until the next minute bar, or the next open or midnight if closed."""
+        now = datetime.now(EASTERN)
+        if market_is_open_at(now):
+            next_event = (now + timedelta(minutes=1)).replace(second=0, microsecond=0)
+        else:
+            midnight = datetime.combine(now.date() + timedelta(days=1), time(), EASTERN)
+            next_open = next_market_open(now)
+            next_event = min(midnight, next_open) if next_open else midnight
+        return max((next_event - now).total_seconds(), 1.0)
+
+    def _get_data_path(self) -> Path:
+        """Return the canonical data file path for this symbol."""
+        return get_symbol_data_path(self.data_dir, self.symbol)
+
+    @staticmethod
+    def _sorted(data: pd.DataFrame | None) -> pd.DataFrame | None:
+        """Sort freshly loaded data once; intraday updates keep it monotonic."""
+        if data is None or data.index.is_monotonic_increasing:
+            return data
+        return data.sort_index()
 
     def _last_trading_day_from_data(self) -> date | None:
         """Extract the last trading day present in loaded data."""
@@ -129,16 +289,17 @@ class MarketServer:
             return None
         return self.data.index[-1].date()
 
-    def _archive_current_csv(self) -> None:
-        """Move the current CSV file to the stale archive folder."""
-        archive_csv(self.data_dir, self.symbol, self.stale_dir)
-        logger.info(f"[{self.symbol}] Archived CSV for symbol")
+    def _archive_current_data(self) -> None:
+        """Move the current data file to the stale archive folder."""
+        archive_symbol_data(self.data_dir, self.symbol, self.stale_dir)
+        logger.info(f"[{self.symbol}] Archived data file for symbol")
 
-    async def _check_new_trading_day(self) -> None:
+    async def _check_new_trading_day(self, today: date) -> None:
         """Detect the transition to a new trading day and reload interday data."""
-        today = datetime.now(EASTERN).date()
         if self.current_day == today or not is_trading_day(today):
             return
+        # The refresh below archives and rewrites the same file.
+        await self._wait_for_persist()
 
         logger.info(f"[{self.symbol}] New trading day: {today}")
         is_consecutive = not self.current_day or is_consecutive_trading_day(
@@ -147,78 +308,153 @@ class MarketServer:
 
         if not is_consecutive:
             logger.warning(f"[{self.symbol}] Gap detected — refreshing data")
-            self._archive_current_csv()
+        # Always archive: the last row may hold intraday ticks, and the
+        # freshness check would otherwise keep it instead of the official bar.
+        self._archive_current_data()
 
-        self.data = get_interday_data(self.symbol, self.data_dir)
+        self.data = self._sorted(
+            await asyncio.to_thread(get_interday_data, self.symbol, self.data_dir)
+        )
+        self._mark_data_changed()
         self.current_day = today
+        await self._daily_checkpoint()
 
-    async def _fetch_intraday_update(self, pool_name: str = "live") -> None:
+    async def _fetch_intraday_update(
+        self, pool_name: str = "live", today: date | None = None
+    ) -> None:
         """Fetch one new minute-level datapoint, update memory + disk, and broadcast."""
         if not market_is_open():
+            await self._flush_unsaved_ticks()
             return
         if self.data is None:
             logger.warning(f"[{self.symbol}] Data not loaded; skipping update")
             return
 
-        today = pd.Timestamp.now(tz=EASTERN).date()
-        prev_day_data = self.data[self.data.index.date < today]
+        if today is None:
+            today = datetime.now(EASTERN).date()
+        # The index is sorted, so rows before today are a positional prefix.
+        # Only the factor is taken from them: a live slice would make the
+        # in-place tick write below copy the whole frame.
+        cut = self.data.index.searchsorted(pd.Timestamp(today))
+        adj_factor = adjustment_factor(self.data, cut)
 
-        ohlcv_row, timestamp = get_intraday_datapoint(self.symbol, prev_day_data)
+        ohlcv_row, timestamp = get_intraday_datapoint(self.symbol, adj_factor)
         if ohlcv_row is None or ohlcv_row.empty or not timestamp:
             return
 
         timestamp = pd.Timestamp(timestamp).tz_convert(EASTERN)
         trading_day_ts = pd.Timestamp(timestamp.date())
-        logger.info(f"[{self.symbol}] Intraday: {timestamp} → {ohlcv_row['Adj Close']}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                f"[{self.symbol}] Intraday: {timestamp} → {ohlcv_row['Adj Close']}"
+            )
 
         self._update_intraday_data(trading_day_ts, ohlcv_row)
-        self._persist_data_to_csv()
+        self._unsaved_ticks += 1
+        if self._unsaved_ticks >= self.PERSIST_EVERY_TICKS:
+            self._start_persist()
 
         await self._broadcast_intraday_update(pool_name, timestamp, ohlcv_row)
         await self._broadcast_analytics_updates(timestamp)
 
     def _update_intraday_data(self, day_ts: pd.Timestamp, ohlcv_row: pd.Series) -> None:
-        """Insert or update the intraday OHLCV row in memory."""
-        new_row = pd.DataFrame(
-            [ohlcv_row.values], index=[day_ts], columns=ohlcv_row.index
-        )
-        if day_ts in self.data.index:
-            self.data.loc[day_ts] = ohlcv_row.values
+        """Insert or update the intraday OHLCV row in memory.
+
+        Ticks only ever touch the latest day, so the row is written in place
+        (or appended once per day) and the index stays sorted without a
+        concat/sort over the whole history.
+        """
+        index = self.data.index
+        if len(index) and day_ts < index[-1]:
+            raise ValueError(
+                f"[{self.symbol}] Intraday bar {day_ts} precedes {index[-1]}"
+            )
+        if len(index) and day_ts == index[-1]:
+            cols = self.data.columns.get_indexer(ohlcv_row.index)
+            self.data.iloc[-1, cols] = ohlcv_row.to_numpy()
         else:
-            self.data = pd.concat([self.data, new_row])
-        self.data.sort_index(inplace=True)
+            self.data.loc[day_ts, ohlcv_row.index] = ohlcv_row.to_numpy()
+        self._mark_data_changed(last_row_only=True)
+
+    def _start_persist(self) -> None:
+        """Write a snapshot of the current data to disk in the background.
 
-    def _persist_data_to_csv(self) -> None:
-        """Save current data state to CSV."""
-        save_interday_data(self.data, self.symbol, self.data_dir)
+        The caller does not wait for the write. While a previous write is
+        still running, the ticks stay unsaved and go out with the next one.
+        """
+        if self._persist_task and not self._persist_task.done():
+            return
+        snapshot = self.data.copy()
+        ticks, self._unsaved_ticks = self._unsaved_ticks, 0
+        self._persist_task = asyncio.create_task(self._save_snapshot(snapshot, ticks))
+
+    async def _save_snapshot(self, snapshot: pd.DataFrame, ticks: int) -> None:
+        try:
+            await asyncio.to_thread(
+                save_interday_data, snapshot, self.symbol, self.data_dir
+            )
+        except Exception as exc:
+            logger.error(f"[{self.symbol}] Failed to persist data: {exc}")
+            # Count the ticks as unsaved again so the next write retries them
+            self._unsaved_ticks += ticks
+
+    async def _wait_for_persist(self) -> None:
+        """Wait for an in-flight background write, if any."""
+        if self._persist_task:
+            await self._persist_task
+
+    async def _daily_checkpoint(self) -> None:
+        """Make the data file in use durable after the day's download.
+
+        Tick writes skip fsync, so this runs once per trading day, after the
+        rollover (or startup) replaced the file.
+        """
+        try:
+            await asyncio.to_thread(sync_interday_data, self.data_dir, self.symbol)
+        except OSError as exc:
+            logger.warning(f"[{self.symbol}] Daily checkpoint failed: {exc}")
+
+    async def _flush_unsaved_ticks(self) -> None:
+        """Persist intraday ticks not yet written, e.g. after the close or on stop."""
+        await self._wait_for_persist()
+        if self._unsaved_ticks and self.data is not None:
+            self._start_persist()
+            await self._wait_for_persist()
 
     # Broadcasting
     async def _broadcast_intraday_update(
         self, pool_name: str, timestamp: pd.Timestamp, ohlcv_row: pd.Series
     ) -> None:
         """Broadcast the live intraday update to subscribers."""
-        payload = json.dumps(
+        payload = orjson.dumps(
             {
                 "symbol": self.symbol,
                 "timestamp": timestamp.isoformat(),
                 "ohlcv": ohlcv_row.to_dict(),
-            }
-        )
+            },
+            option=orjson.OPT_SERIALIZE_NUMPY,
+        ).decode()
         await self.push_update(pool_name, payload)
 
     async def _broadcast_analytics_updates(self, timestamp: pd.Timestamp) -> None:
-        for pool_name in self._ws_pools:
-            if not pool_name.startswith("analytics-"):
-                continue
-
-            strategy = pool_name.removeprefix("analytics-")
-            if not self.analytics.exists(strategy):
-                continue
+        # Strategies are independent, so they run side by side in worker
+        # threads instead of one after another on the event loop.
+        pools = list(self._analytics_pools.items())
+        outcomes = await asyncio.gather(
+            *(
+                asyncio.to_thread(
+                    self.analytics.execute, strategy, self.data, self.symbol, True
+                )
+                for strategy, _ in pools
+            ),
+            return_exceptions=True,
+        )
 
+        for (strategy, pool), outcome in zip(pools, outcomes):
             try:
-                result, notification = self.analytics.execute(
-                    strategy, self.data, self.symbol, True
-                )
+                if isinstance(outcome, Exception):
+                    raise outcome
+                result, notification = outcome
 
                 if notification:
                     registered = self.notifier.register(notification)
@@ -236,8 +472,12 @@ class MarketServer:
                 )
                 continue
 
-            payload = json.dumps(
+            # Notifications above still fire for pools whose clients all left.
+            if not pool:
+                continue
+            payload = orjson.dumps(
                 format_analytics_payload(self.symbol, strategy, result),
                 default=str,
-            )
-            await self.push_update(pool_name, payload)
+                option=orjson.OPT_SERIALIZE_NUMPY,
+            ).decode()
+            await self._send_to_pool(pool, payload)
@@ -1,13 +1,85 @@
 import random
+from bisect import bisect_left
 from datetime import datetime, timedelta
+from functools import lru_cache
 from typing import Any, Dict, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 
 from sma200.notifications import Notification
 from sma200.utils import UTC
 
 
+def _rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """Trailing mean over `window` values via prefix sums.
+
+    Matches `Series.rolling(window).mean()`: NaN until the window is full and
+    for any window containing a NaN.
+    """
+    out = np.full(len(values), np.nan)
+    if len(values) < window:
+        return out
+    missing = np.isnan(values)
+    sums = np.concatenate(([0.0], np.cumsum(np.where(missing, 0.0, values))))
+    gaps = np.concatenate(([0], np.cumsum(missing)))
+    means = (sums[window:] - sums[:-window]) / window
+    means[gaps[window:] - gaps[:-window] > 0] = np.nan
+    out[window - 1 :] = means
+    return out
+
+
+def _sma_bands(
+    values: np.ndarray, window: int, upper_factor: float, lower_factor: float
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Rolling mean with its upper and lower bands.
+
+    Both bands come from a single outer product into one (2, n) block.
+    """
+    sma = _rolling_mean(values, window)
+    upper, lower = np.multiply.outer((upper_factor, lower_factor), sma)
+    return sma, upper, lower
+
+
+# Signals are computed as int8 codes and only mapped to labels for output.
+# The labels use object dtype so lookups share the three str objects
+# instead of decoding a new string per element.
+_HOLD, _BUY, _SELL = 0, 1, 2
+_SIGNAL_LABELS = np.array(["HOLD", "BUY", "SELL"], dtype=object)
+
+
+def _threshold_positions(
+    prices: np.ndarray, upper: np.ndarray, lower: np.ndarray
+) -> np.ndarray:
+    """Whether a threshold-band position is held after each bar.
+
+    A position is entered when the price reaches the upper band and left
+    when it falls below the lower band; the bands are assumed not to cross.
+    The position after each bar is therefore the most recent entry/exit
+    event, which is forward-filled instead of looping bar by bar.
+    """
+    above = prices >= upper
+    below = prices < lower
+    last_event = np.where(above | below, np.arange(len(prices)), -1)
+    np.maximum.accumulate(last_event, out=last_event)
+    return (last_event >= 0) & above[last_event]
+
+
+def _threshold_signals(
+    prices: np.ndarray, upper: np.ndarray, lower: np.ndarray
+) -> np.ndarray:
+    """Vectorized HOLD/BUY/SELL codes for a threshold-band position."""
+    invested = _threshold_positions(prices, upper, lower)
+    was_invested = np.concatenate(([False], invested[:-1]))
+    codes = np.full(len(invested), _HOLD, dtype=np.int8)
+    codes[invested & ~was_invested] = _BUY
+    codes[~invested & was_invested] = _SELL
+    return codes
+
+
+_COOLDOWN_UNIT_SECONDS = {"minute": 60, "hour": 3600, "day": 86400}
+
+
 class BaseStrategy:
     """Abstract base class for all trading strategies."""
 
@@ -29,6 +101,7 @@ class BaseStrategy:
         return cooldowns
 
     @staticmethod
+    @lru_cache(maxsize=256)
     def parse_cooldown(text: str) -> timedelta:
         """Parse a single cooldown string like '2 hours' into a timedelta."""
         parts = text.split()
@@ -39,14 +112,10 @@ class BaseStrategy:
             num = float(num_str)
         except ValueError as exc:
             raise ValueError(f"Invalid number in cooldown: {text!r}") from exc
-        if "hour" in unit:
-            return timedelta(hours=num)
-        elif "minute" in unit:
-            return timedelta(minutes=num)
-        elif "day" in unit:
-            return timedelta(days=num)
-        else:
+        seconds = _COOLDOWN_UNIT_SECONDS.get(unit.removesuffix("s"))
+        if seconds is None:
             raise ValueError(f"Unsupported cooldown unit: {unit!r}")
+        return timedelta(seconds=num * seconds)
 
     def cooldown_for_label(self, label: str) -> timedelta:
         """Return configured timedelta for label, or a 1-hour default."""
@@ -57,6 +126,9 @@ class BaseStrategy:
     ) -> Dict[str, Any]:
         raise NotImplementedError
 
+    def reset(self) -> None:
+        """Drop any state derived from previously computed data."""
+
     def generate_notifications(
         self, result: Dict[str, Any], symbol: str, streaming_update: bool = False
     ) -> Optional[Notification]:
@@ -95,72 +167,141 @@ class DummyStrategy(BaseStrategy):
 class SMAWithThresholdStrategy(BaseStrategy):
     """Simple Moving Average strategy using upper/lower threshold bands."""
 
+    def __init__(self, config: Dict[str, Any]):
+        super().__init__(config)
+        self._window = int(self.config["window"])
+        self._upper_factor = 1.0 + float(self.config["upper_threshold"])
+        self._lower_factor = 1.0 - float(self.config["lower_threshold"])
+        # For every bar but the last: ((bar count, last timestamp), position
+        # held, sum of the trailing window - 1 prices). Intraday ticks only
+        # change the last bar, so streaming updates reuse this.
+        self._settled: Optional[Tuple[Tuple[int, pd.Timestamp], bool, float]] = None
+        # Reminder levels (percent) with their band factors, parsed once.
+        levels = tuple(
+            sorted(
+                float(k.strip("%"))
+                for k in self.config.get("cooldowns", {}).get("REMINDERS", {})
+            )
+        ) or (1.0, 2.5, 5.0)
+        self._buy_reminders = tuple((p, 1 - p / 100) for p in levels)
+        self._sell_reminders = tuple((p, 1 + p / 100) for p in levels)
+
+    def reset(self) -> None:
+        self._settled = None
+
     def compute(
         self, df: pd.DataFrame, symbol: str, streaming_update: bool = False
     ) -> Dict[str, Any]:
-        window = self.config["window"]
-        upper_pct = self.config["upper_threshold"]
-        lower_pct = self.config["lower_threshold"]
-
-        sma = df["Adj Close"].rolling(window=window).mean()
-        valid_mask = sma.notna()
-        df_valid = df.loc[valid_mask].copy()
-
-        df_valid["sma"] = sma[valid_mask]
-        df_valid["upper_band"] = df_valid["sma"] * (1 + upper_pct)
-        df_valid["lower_band"] = df_valid["sma"] * (1 - lower_pct)
-
-        prices = df_valid["Adj Close"].tolist()
-        sma_values = df_valid["sma"].tolist()
-        upper_band = df_valid["upper_band"].tolist()
-        lower_band = df_valid["lower_band"].tolist()
-        dates = [d.isoformat() for d in df_valid.index]
-
-        signals: list[str] = []
-        invested = False
-        for price, up, low in zip(prices, upper_band, lower_band):
-            if not invested and price >= up:
-                signals.append("BUY")
-                invested = True
-            elif invested and price < low:
-                signals.append("SELL")
-                invested = False
-            else:
-                signals.append("HOLD")
+        window = self._window
+
+        adj_close = df["Adj Close"].to_numpy(dtype=np.float64)
+        if streaming_update and (latest := self._latest_bar(df, adj_close)):
+            return latest
+
+        sma_full, upper_full, lower_full = _sma_bands(
+            adj_close, window, self._upper_factor, self._lower_factor
+        )
+        # Only the first window - 1 values are NaN unless prices are missing;
+        # a slice then selects the rest as views instead of boolean copies.
+        valid: slice | np.ndarray = slice(window - 1, None)
+        if np.isnan(sma_full[valid]).any():
+            valid = ~np.isnan(sma_full)
+
+        price_arr = adj_close[valid]
+        sma_arr = sma_full[valid]
+        upper_arr = upper_full[valid]
+        lower_arr = lower_full[valid]
+
+        index = df.index if df.index.tz is None else df.index.tz_localize(None)
+        dates = np.datetime_as_string(index.values[valid], unit="s").tolist()
+
+        signal_codes = _threshold_signals(price_arr, upper_arr, lower_arr)
 
         if streaming_update and len(dates) > 0:
             idx = -1
             return {
                 "date": dates[idx],
-                "price": prices[idx],
-                "sma": sma_values[idx],
-                "upper_band": upper_band[idx],
-                "lower_band": lower_band[idx],
-                "signal": signals[idx],
+                "price": price_arr[idx].item(),
+                "sma": sma_arr[idx].item(),
+                "upper_band": upper_arr[idx].item(),
+                "lower_band": lower_arr[idx].item(),
+                "signal": _SIGNAL_LABELS[signal_codes[idx]],
             }
 
+        # Numeric series stay float64 arrays; orjson encodes them natively
+        # (OPT_SERIALIZE_NUMPY), so there is no per-element boxing.
+        signals: list[str] = _SIGNAL_LABELS[signal_codes].tolist()
         return {
             "dates": dates,
-            "prices": prices,
-            "sma": sma_values,
-            "upper_band": upper_band,
-            "lower_band": lower_band,
+            "prices": price_arr,
+            "sma": sma_arr,
+            "upper_band": upper_arr,
+            "lower_band": lower_arr,
             "signal": signals,
         }
 
+    def _latest_bar(
+        self, df: pd.DataFrame, adj_close: np.ndarray
+    ) -> Optional[Dict[str, Any]]:
+        """Streaming result for the last bar in O(1) once earlier bars are known.
+
+        Returns None if the incremental path does not apply (too little data
+        or missing prices), in which case the full computation is used.
+        """
+        window = self._window
+        upper_factor, lower_factor = self._upper_factor, self._lower_factor
+        n = len(adj_close)
+        if n < max(window, 2):
+            return None
+
+        key = (n - 1, df.index[-2])
+        if self._settled is None or self._settled[0] != key:
+            settled = adj_close[:-1]
+            sma, upper, lower = _sma_bands(settled, window, upper_factor, lower_factor)
+            valid = ~np.isnan(sma)
+            held = _threshold_positions(settled[valid], upper[valid], lower[valid])
+            invested = bool(held[-1]) if len(held) else False
+            self._settled = (key, invested, float(settled[n - window :].sum()))
+
+        _, invested, settled_sum = self._settled
+        price = float(adj_close[-1])
+        sma = (settled_sum + price) / window
+        if np.isnan(sma):
+            return None
+
+        upper = sma * upper_factor
+        lower = sma * lower_factor
+        if not invested and price >= upper:
+            signal = "BUY"
+        elif invested and price < lower:
+            signal = "SELL"
+        else:
+            signal = "HOLD"
+
+        return {
+            "date": df.index[-1].isoformat(),
+            "price": price,
+            "sma": sma,
+            "upper_band": upper,
+            "lower_band": lower,
+            "signal": signal,
+        }
+
     def generate_notifications(
         self, result: Dict[str, Any], symbol: str, streaming_update: bool = False
     ) -> Optional[Notification]:
-    
-        def get_val(*keys):
-            val = next((result[k] for k in keys if k in result), None)
-            return val[-1] if isinstance(val, list) else val
-
-        last_signal = get_val("signal")
-        last_price = float(get_val("prices", "price"))
-        last_sma = float(get_val("sma"))
-        last_upper = float(get_val("upper_band"))
-        last_lower = float(get_val("lower_band"))
+        if "prices" in result:  # full series of float64 arrays
+            last_signal = result["signal"][-1]
+            last_price = result["prices"][-1].item()
+            last_sma = result["sma"][-1].item()
+            last_upper = result["upper_band"][-1].item()
+            last_lower = result["lower_band"][-1].item()
+        else:  # streaming update: Python floats for the latest bar
+            last_signal = result["signal"]
+            last_price = result["price"]
+            last_sma = result["sma"]
+            last_upper = result["upper_band"]
+            last_lower = result["lower_band"]
 
         if last_signal == "BUY":
             threshold = last_upper - last_sma
@@ -187,27 +328,22 @@ class SMAWithThresholdStrategy(BaseStrategy):
             cooldown = self.cooldown_for_label(label)
 
         elif last_signal == "HOLD":
-            reminder_levels = tuple(
-                float(k.strip("%"))
-                for k in self.config["cooldowns"].get("REMINDERS", {}).keys()
-            ) or (5.0, 2.5, 1.0)
-            reminder_levels = tuple(sorted(reminder_levels))
-            buy_diffs = [(p, last_upper * (1 - p / 100)) for p in reminder_levels]
-            sell_diffs = [(p, last_lower * (1 + p / 100)) for p in reminder_levels]
             triggered = None
 
-            # buy side
-            for pct, limit in buy_diffs:
-                if last_price >= limit and last_price < last_upper:
-                    triggered = ("BUY", pct)
-                    break
+            # The limits are monotonic in the level, so the tightest level
+            # the price is within is found by bisection.
+            # buy side: limits fall as the level grows
+            buy = self._buy_reminders
+            i = bisect_left(buy, -last_price, key=lambda r: -last_upper * r[1])
+            if i < len(buy) and last_upper * buy[i][1] <= last_price < last_upper:
+                triggered = ("BUY", buy[i][0])
 
-            # sell side
+            # sell side: limits rise as the level grows
             if triggered is None:
-                for pct, limit in sell_diffs:
-                    if last_price <= limit and last_price > last_lower:
-                        triggered = ("SELL", pct)
-                        break
+                sell = self._sell_reminders
+                i = bisect_left(sell, last_price, key=lambda r: last_lower * r[1])
+                if i < len(sell) and last_lower < last_price <= last_lower * sell[i][1]:
+                    triggered = ("SELL", sell[i][0])
 
             if triggered is None:
                 return None
@@ -267,6 +403,11 @@ class Analytics:
         # internal names (unchanged)
         return list(self._registry.keys())
 
+    def reset(self) -> None:
+        """Drop strategy state derived from previously seen data."""
+        for strategy, _ in self._registry.values():
+            strategy.reset()
+
     def execute(self, name: str, df, symbol, streaming_update=False):
         strategy = self.get(name)
         result = strategy.compute(df, symbol, streaming_update)
@@ -1,4 +1,6 @@
-from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
 from pathlib import Path
 
 import pandas as pd
@@ -7,75 +9,238 @@ import yfinance as yf
 # Import the logger from the config file
 from config import logger
 
+from .io import (
+    get_symbol_data_path,
+    migrate_legacy_csv,
+    read_interday_file,
+    save_interday_data,
+)
+from .utils import EASTERN, is_trading_day, previous_trading_day
 
-def get_interday_data(symbol: str, data_dir: Path):
-    """Download or load interday stock data, ensuring cache is clean."""
-    data_dir.mkdir(exist_ok=True, parents=True)
-    csv_file = data_dir / f"{symbol.replace('^', '')}.csv"
 
-    if csv_file.exists():
-        try:
-            cached_df = pd.read_csv(csv_file, index_col=0, parse_dates=True)
-            if not cached_df.empty:
-                last_trading_day = pd.bdate_range(end=pd.Timestamp.today(), periods=2)[
-                    0
-                ].date()
-                if cached_df.index[-1].date() >= last_trading_day:
-                    logger.info(f"Loading fresh data from {csv_file}")
-                    return cached_df
-        except Exception:
-            logger.warning(
-                f"Cache file {csv_file} is corrupt or empty. Will re-download."
-            )
+OHLCV_COLUMNS = ["Open", "High", "Low", "Close", "Adj Close", "Volume"]
+
+# Yahoo serves up to this many tickers per download request.
+DOWNLOAD_CHUNK_SIZE = 20
+# Concurrent single-ticker downloads; capped to stay clear of rate limits.
+DOWNLOAD_MAX_WORKERS = 10
 
-    logger.info(f"Downloading data for {symbol}")
+
+@lru_cache(maxsize=4)
+def _freshness_cutoff(today: date) -> date:
+    """Oldest last row a cache may have on `today` to count as fresh."""
+    return pd.bdate_range(end=pd.Timestamp(today), periods=2)[0].date()
+
+
+def _load_fresh_cache(data_file: Path) -> pd.DataFrame | None:
+    """Return the cached frame if it already covers the last trading day."""
     try:
-        df = yf.download(
-            symbol, period="max", interval="1d", progress=False, auto_adjust=False
-        )
+        cached_df = read_interday_file(data_file)
+        if not cached_df.empty:
+            last_trading_day = _freshness_cutoff(date.today())
+            if cached_df.index[-1].date() >= last_trading_day:
+                logger.info(f"Loading fresh data from {data_file}")
+                return cached_df
+    except FileNotFoundError:
+        pass
+    except Exception:
+        logger.warning(f"Cache file {data_file} is corrupt or empty. Will re-download.")
+    return None
+
+
+def _load_stale_cache(data_file: Path) -> pd.DataFrame:
+    """Fall back to whatever is cached when a download fails."""
+    try:
+        cached_df = read_interday_file(data_file)
+    except FileNotFoundError:
+        return pd.DataFrame()
+    logger.info("Falling back to old cached data")
+    return cached_df
+
+
+def _store_download(symbol: str, raw: pd.DataFrame, data_dir: Path) -> pd.DataFrame:
+    """Extract one symbol from a download, clean it and write it to the cache."""
+    data_file = get_symbol_data_path(data_dir, symbol)
+    try:
+        # Multi-ticker downloads are grouped by ticker on the outer column level
+        df = raw[symbol] if isinstance(raw.columns, pd.MultiIndex) else raw
+        df = df.dropna(how="all")
         if df.empty:
             logger.warning(f"No data for {symbol}")
             return pd.DataFrame()
 
-        # If multi-index columns, flatten to row-based multiindex
-        if isinstance(df.columns, pd.MultiIndex):
-            df = df.stack(level="Ticker", future_stack=True)
-            df.index.names = ["Date", "Symbol"]
-            df = df[["Open", "High", "Low", "Close", "Adj Close", "Volume"]]
-            df = df.swaplevel(0, 1)
-            df = df.sort_index()
-            df = df.xs(symbol)
-        else:
-            # Normal single-symbol structure
-            df.index.name = "Date"
-            df = df[["Open", "High", "Low", "Close", "Adj Close", "Volume"]]
+        df = df[OHLCV_COLUMNS]
+        df.index.name = "Date"
 
         # Now safe to reindex by Date
         full_range = pd.date_range(df.index.min(), df.index.max(), freq="D")
-        df = df.reindex(full_range).ffill().bfill()
+        df = df.reindex(full_range)
+        # Gap-free ranges (e.g. crypto trading every day) need no fill pass
+        if df.isna().to_numpy().any():
+            df = df.ffill().bfill()
+        # The fills leave a row-major block behind; copy so each column is
+        # contiguous for the column-wise analytics.
+        df = df.copy()
         df.index.name = "Date"
 
         # Save cleaned version
-        df.to_csv(csv_file)
+        save_interday_data(df, symbol, data_dir)
         return df
 
     except Exception as e:
         logger.error(f"Failed to download data for {symbol}: {e}")
-        if csv_file.exists():
-            logger.info("Falling back to old cached data")
-            return pd.read_csv(csv_file, index_col=0, parse_dates=True)
-        return pd.DataFrame()
+        return _load_stale_cache(data_file)
 
 
-def get_intraday_datapoint(symbol: str, df: pd.DataFrame):
-    """Fetch the most recent completed intraday minute datapoint.
-    Adds a back-adjusted 'Adj Close' column so structure matches daily data.
-    Returns:
-        (ohlcv_row: pd.Series, timestamp: pd.Timestamp)
+def migrate_legacy_caches(symbols: list[str], data_dir: Path) -> None:
+    """Convert any CSV caches from older releases to Parquet."""
+    for symbol in symbols:
+        try:
+            migrate_legacy_csv(data_dir, symbol)
+        except Exception as e:
+            logger.warning(f"Could not migrate CSV cache for {symbol}: {e}")
+
+
+def get_interday_data_batch(
+    symbols: list[str],
+    data_dir: Path,
+    chunk_size: int = DOWNLOAD_CHUNK_SIZE,
+    refresh: bool = False,
+) -> dict[str, pd.DataFrame]:
+    """Download or load interday data for several symbols at once.
+
+    Symbols without a fresh cache are fetched together, `chunk_size` tickers
+    per request, instead of one request each. `refresh` downloads every
+    symbol, e.g. to replace intraday rows with the official daily bars.
     """
-    now_utc = datetime.now(timezone.utc).replace(second=0, microsecond=0)
-    start = now_utc - timedelta(minutes=2)
-    end = now_utc - timedelta(minutes=1)
+    data_dir.mkdir(exist_ok=True, parents=True)
+    frames: dict[str, pd.DataFrame] = {}
+    stale: list[str] = []
+    for symbol in symbols:
+        if refresh:
+            stale.append(symbol)
+            continue
+        cached_df = _load_fresh_cache(get_symbol_data_path(data_dir, symbol))
+        if cached_df is None:
+            stale.append(symbol)
+        else:
+            frames[symbol] = cached_df
+
+    for start in range(0, len(stale), chunk_size):
+        chunk = stale[start : start + chunk_size]
+        logger.info(f"Downloading data for {', '.join(chunk)}")
+        try:
+            raw = yf.download(
+                " ".join(chunk),
+                period="max",
+                interval="1d",
+                progress=False,
+                auto_adjust=False,
+                threads=True,
+                group_by="ticker",
+            )
+        except Exception as e:
+            logger.error(f"Failed to download data for {', '.join(chunk)}: {e}")
+            if len(chunk) > 1:
+                # Retry ticker by ticker so one bad symbol does not sink the rest
+                frames.update(download_many(chunk, data_dir, refresh=refresh))
+            else:
+                data_file = get_symbol_data_path(data_dir, chunk[0])
+                frames[chunk[0]] = _load_stale_cache(data_file)
+            continue
+
+        for symbol in chunk:
+            frames[symbol] = _store_download(symbol, raw, data_dir)
+
+    return frames
+
+
+def get_interday_data(
+    symbol: str, data_dir: Path, refresh: bool = False
+) -> pd.DataFrame:
+    """Download or load interday stock data, ensuring cache is clean."""
+    return get_interday_data_batch([symbol], data_dir, refresh=refresh)[symbol]
+
+
+def _may_hold_intraday_rows(data_file: Path, today: date) -> bool:
+    """Whether the cached last row could still be built from intraday ticks.
+
+    The server writes ticks into the current day's row, so on a trading day
+    a cache ending on the previous trading day or later may hold such a row.
+    """
+    if not is_trading_day(today):
+        return False
+    try:
+        cached_df = read_interday_file(data_file)
+    except Exception:
+        return False  # Missing or unreadable; the freshness check handles it
+    last_trading_day = previous_trading_day(today)
+    return (
+        not cached_df.empty
+        and last_trading_day is not None
+        and cached_df.index[-1].date() >= last_trading_day
+    )
+
+
+def refresh_interday_data(
+    symbols: list[str], data_dir: Path
+) -> dict[str, pd.DataFrame]:
+    """Load interday data at startup, re-downloading rows that may be intraday.
+
+    Caches whose last row may come from an earlier run's intraday ticks are
+    downloaded again for the official daily bars; the rest go through the
+    usual freshness check.
+    """
+    today = datetime.now(EASTERN).date()
+    forced, checked = [], []
+    for symbol in symbols:
+        if _may_hold_intraday_rows(get_symbol_data_path(data_dir, symbol), today):
+            forced.append(symbol)
+        else:
+            checked.append(symbol)
+    frames = get_interday_data_batch(forced, data_dir, refresh=True)
+    frames.update(get_interday_data_batch(checked, data_dir))
+    return frames
+
+
+def download_many(
+    symbols: list[str],
+    data_dir: Path,
+    max_workers: int = DOWNLOAD_MAX_WORKERS,
+    refresh: bool = False,
+) -> dict[str, pd.DataFrame]:
+    """Run `get_interday_data` for each symbol concurrently.
+
+    For requests that cannot be coalesced into one batch; each symbol keeps
+    its own fallback, so a failure only affects that symbol.
+    """
+    frames: dict[str, pd.DataFrame] = {}
+    if not symbols:
+        return frames
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(symbols))) as pool:
+        futures = {
+            pool.submit(get_interday_data, s, data_dir, refresh): s for s in symbols
+        }
+        for future in as_completed(futures):
+            symbol = futures[future]
+            try:
+                frames[symbol] = future.result()
+            except Exception as e:
+                logger.error(f"Failed to load data for {symbol}: {e}")
+                frames[symbol] = pd.DataFrame()
+    return frames
+
+
+@lru_cache(maxsize=256)
+def _fetch_intraday_bar(
+    symbol: str, minute: datetime
+) -> tuple[pd.Series | None, pd.Timestamp | None]:
+    """Download the last completed 1m bar before `minute`, once per minute.
+
+    Callers get a shared Series and must not modify it.
+    """
+    start = minute - timedelta(minutes=2)
+    end = minute - timedelta(minutes=1)
     try:
         intraday = yf.download(
             symbol,
@@ -89,29 +254,47 @@ def get_intraday_datapoint(symbol: str, df: pd.DataFrame):
             logger.debug(f"No intraday data for {symbol} in the last minute.")
             return None, None
 
-        # Handle multi-ticker case
+        # Handle multi-ticker case: select the ticker's columns directly
         if isinstance(intraday.columns, pd.MultiIndex):
-            intraday = intraday.stack(level="Ticker", future_stack=True)
-            intraday.index.names = ["Datetime", "Symbol"]
-            intraday = intraday[["Open", "High", "Low", "Close", "Volume"]]
-            intraday = intraday.swaplevel(0, 1).sort_index()
-            intraday = intraday.xs(symbol)
-        else:
-            intraday.index.name = "Datetime"
-            intraday = intraday[["Open", "High", "Low", "Close", "Volume"]]
-
-        # Derive adjustment factor from daily data
-        adj_factor = 1.0
-        if not df.empty and "Adj Close" in df.columns and "Close" in df.columns:
-            latest_daily = df.iloc[-1]
-            adj_factor = latest_daily["Adj Close"] / latest_daily["Close"]
-
-        intraday["Adj Close"] = intraday["Close"] * adj_factor
-        intraday = intraday[["Open", "High", "Low", "Close", "Adj Close", "Volume"]]
-        latest_row = intraday.iloc[-1]
-        timestamp = intraday.index[-1]
-        return latest_row, timestamp
+            intraday = intraday.xs(symbol, axis=1, level="Ticker")
+        intraday.index.name = "Datetime"
+        intraday = intraday[["Open", "High", "Low", "Close", "Volume"]]
+        return intraday.iloc[-1], intraday.index[-1]
 
     except Exception as e:
         logger.error(f"Failed to get intraday data for {symbol}: {e}")
         return None, None
+
+
+def adjustment_factor(df: pd.DataFrame, end: int | None = None) -> float:
+    """Return Adj Close / Close of the last daily row before position `end`.
+
+    Only scalars are read, so no view of `df` outlives the call.
+    """
+    if end is None:
+        end = len(df)
+    if end <= 0 or "Adj Close" not in df.columns or "Close" not in df.columns:
+        return 1.0
+    return df["Adj Close"].iat[end - 1] / df["Close"].iat[end - 1]
+
+
+def get_intraday_datapoint(symbol: str, adj_factor: float = 1.0):
+    """Fetch the most recent completed intraday minute datapoint.
+    Adds a back-adjusted 'Adj Close' column so structure matches daily data,
+    using `adj_factor` from the daily data (see `adjustment_factor`).
+    Repeated calls within the same clock minute reuse the first download.
+    Returns:
+        (ohlcv_row: pd.Series, timestamp: pd.Timestamp)
+    """
+    now_utc = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+    bar, timestamp = _fetch_intraday_bar(symbol, now_utc)
+    if bar is None:
+        return None, None
+
+    open_, high, low, close, volume = bar.to_numpy().tolist()
+    latest_row = pd.Series(
+        [open_, high, low, close, close * adj_factor, volume],
+        index=OHLCV_COLUMNS,
+        name=bar.name,
+    )
+    return latest_row, timestamp
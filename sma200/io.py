@@ -1,5 +1,7 @@
+import os
 import shutil
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
 
 import pandas as pd
@@ -7,44 +9,105 @@ import pandas as pd
 from .utils import sanitize_symbol
 
 
-def get_symbol_csv_path(data_dir: Path, symbol: str) -> Path:
-    """Return canonical CSV path for a symbol."""
-    return data_dir / f"{sanitize_symbol(symbol)}.csv"
+def get_symbol_data_path(data_dir: Path, symbol: str) -> Path:
+    """Return canonical Parquet path for a symbol."""
+    return data_dir / f"{sanitize_symbol(symbol)}.parquet"
+
+
+def migrate_legacy_csv(data_dir: Path, symbol: str) -> bool:
+    """Convert a symbol's CSV cache from older releases to Parquet, once.
+
+    Returns whether a CSV file was converted.
+    """
+    data_path = get_symbol_data_path(data_dir, symbol)
+    if data_path.exists():
+        return False
+    csv_path = data_path.with_suffix(".csv")
+    try:
+        df = pd.read_csv(
+            csv_path,
+            index_col=0,
+            parse_dates=True,
+            date_format="ISO8601",
+            dtype={
+                "open": "float64",
+                "high": "float64",
+                "low": "float64",
+                "close": "float64",
+                "volume": "float64",
+            },
+        )
+    except FileNotFoundError:
+        return False
+    save_interday_data(df, symbol, data_dir)
+    csv_path.unlink()
+    return True
+
+
+@lru_cache(maxsize=32)
+def _read_parquet(data_path: Path, mtime_ns: int, size: int) -> pd.DataFrame:
+    # mtime and size are only part of the key: a rewrite invalidates the entry
+    return pd.read_parquet(data_path, engine="pyarrow")
+
+
+def read_interday_file(data_path: Path) -> pd.DataFrame:
+    """Read a Parquet data file, reusing the parsed frame while it is unchanged.
+
+    Raises FileNotFoundError if the file does not exist. The result is a
+    shallow copy; copy-on-write (pandas 3) keeps caller edits out of the
+    cache.
+    """
+    st = os.stat(data_path)
+    return _read_parquet(data_path, st.st_mtime_ns, st.st_size).copy(deep=False)
 
 
 def load_interday_data(symbol: str, data_dir: Path) -> pd.DataFrame | None:
-    """Load interday OHLCV data from CSV."""
-    csv_path = get_symbol_csv_path(data_dir, symbol)
-    if not csv_path.exists():
+    """Load interday OHLCV data from Parquet."""
+    data_path = get_symbol_data_path(data_dir, symbol)
+    try:
+        return read_interday_file(data_path)
+    except FileNotFoundError:
+        pass
+    # Only a missing Parquet file can mean an unconverted CSV cache
+    if not migrate_legacy_csv(data_dir, symbol):
         return None
-    df = pd.read_csv(
-        csv_path,
-        index_col=0,
-        parse_dates=True,
-        dtype={
-            "open": "float64",
-            "high": "float64",
-            "low": "float64",
-            "close": "float64",
-            "volume": "float64",
-        },
-    )
-    return df
+    return read_interday_file(data_path)
 
 
 def save_interday_data(data: pd.DataFrame, symbol: str, data_dir: Path) -> None:
-    """Persist interday data to CSV."""
-    csv_path = get_symbol_csv_path(data_dir, symbol)
-    data.to_csv(csv_path)
+    """Persist interday data to Parquet.
+
+    The file is written next to the target and swapped in with an atomic
+    rename, so readers never see a partial file. There is no fsync here:
+    a crash may lose the last few writes, which can be re-downloaded, and
+    `sync_interday_data` makes the file durable once per trading day.
+    """
+    data_path = get_symbol_data_path(data_dir, symbol)
+    tmp_path = data_path.with_name(f"{data_path.name}.tmp")
+    data.to_parquet(tmp_path, engine="pyarrow", compression="zstd")
+    os.replace(tmp_path, data_path)
+
+
+def sync_interday_data(data_dir: Path, symbol: str) -> None:
+    """Flush the symbol's data file and its directory entry to stable storage."""
+    data_path = get_symbol_data_path(data_dir, symbol)
+    if not data_path.exists():
+        return
+    for path in (data_path, data_dir):
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
 
 
-def archive_csv(data_dir: Path, symbol: str, stale_dir: Path) -> None:
-    """Move current CSV to stale directory with timestamp."""
-    csv_path = get_symbol_csv_path(data_dir, symbol)
-    if not csv_path.exists():
+def archive_symbol_data(data_dir: Path, symbol: str, stale_dir: Path) -> None:
+    """Move current data file to stale directory with timestamp."""
+    data_path = get_symbol_data_path(data_dir, symbol)
+    if not data_path.exists():
         return
 
     stale_dir.mkdir(parents=True, exist_ok=True)
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    dest = stale_dir / f"{csv_path.stem}_{timestamp}.csv"
-    shutil.move(csv_path, dest)
+    dest = stale_dir / f"{data_path.stem}_{timestamp}{data_path.suffix}"
+    shutil.move(data_path, dest)
@@ -1,11 +1,10 @@
+import dbm
 import shelve
+import sqlite3
 import subprocess
-from collections import defaultdict
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import DefaultDict, List, Optional
-
-from sma200.utils import nested_defaultdict
+from typing import Dict, List, Optional, Tuple
 
 
 class Notification:
@@ -33,7 +32,11 @@ class Notification:
 
 
 class Notifier:
-    """Registers and dispatches notifications with per-label cooldown enforcement."""
+    """Registers and dispatches notifications with per-label cooldown enforcement.
+
+    Sent notifications are appended to a per-symbol SQLite log, so
+    registering one writes a single row instead of re-pickling all state.
+    """
 
     def __init__(self, config: dict, symbol: str) -> None:
         self.mailing_list: List[str] = config["mailing_list"]
@@ -45,20 +48,50 @@ class Notifier:
         symbol_dir = datadir / symbol
         symbol_dir.mkdir(parents=True, exist_ok=True)
 
-        self.SHELVE_PATH = symbol_dir / "notifier_state"
-        self._db = shelve.open(str(self.SHELVE_PATH), writeback=True)
-
-        if "notifications" not in self._db:
-            self._db["notifications"] = defaultdict(nested_defaultdict)
-
-        self.notifications: DefaultDict[str, DefaultDict[str, List[Notification]]] = (
-            self._db["notifications"]
+        self.DB_PATH = symbol_dir / "notifier.db"
+        self._db = sqlite3.connect(self.DB_PATH, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS notifications ("
+            "strategy TEXT NOT NULL, label TEXT NOT NULL, "
+            "ts REAL NOT NULL, message TEXT NOT NULL)"
         )
-
-    def _persist(self) -> None:
-        """Ensure changes are written to disk."""
-        self._db["notifications"] = self.notifications
-        self._db.sync()
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS notifications_last "
+            "ON notifications (strategy, label, ts DESC)"
+        )
+        # Last send time per (strategy, label), filled from the log on demand.
+        self._last_sent: Dict[Tuple[str, str], Optional[float]] = {}
+
+        self._migrate_shelve(symbol_dir / "notifier_state")
+
+    def _migrate_shelve(self, shelve_path: Path) -> None:
+        """Import history from the shelve store used by older versions, once."""
+        if not dbm.whichdb(str(shelve_path)):
+            return
+        with shelve.open(str(shelve_path), flag="r") as old:
+            state = old.get("notifications", {})
+            rows = [
+                (n.strategy, n.label, n.timestamp.timestamp(), n.message)
+                for labels in state.values()
+                for bucket in labels.values()
+                for n in bucket
+            ]
+        self._db.executemany("INSERT INTO notifications VALUES (?, ?, ?, ?)", rows)
+        for path in shelve_path.parent.glob(f"{shelve_path.name}*"):
+            path.unlink()
+
+    def _last_sent_ts(self, strategy: str, label: str) -> Optional[float]:
+        key = (strategy, label)
+        if key not in self._last_sent:
+            row = self._db.execute(
+                "SELECT ts FROM notifications WHERE strategy = ? AND label = ? "
+                "ORDER BY ts DESC LIMIT 1",
+                key,
+            ).fetchone()
+            self._last_sent[key] = row[0] if row else None
+        return self._last_sent[key]
 
     def register(self, notification: Notification) -> bool:
         """
@@ -73,16 +106,16 @@ class Notifier:
             notification.cooldown,
         )
 
-        label_bucket = self.notifications[strategy][label]
-        last_same: Optional[Notification] = label_bucket[-1] if label_bucket else None
-
-        if last_same and (now - last_same.timestamp) < cooldown:
+        now_ts = now.timestamp()
+        last_ts = self._last_sent_ts(strategy, label)
+        if last_ts is not None and now_ts - last_ts < cooldown.total_seconds():
             return False
 
-        label_bucket.append(notification)
-        self.notifications[strategy][label] = label_bucket[-2:]
-
-        self._persist()
+        self._db.execute(
+            "INSERT INTO notifications VALUES (?, ?, ?, ?)",
+            (strategy, label, now_ts, notification.message),
+        )
+        self._last_sent[(strategy, label)] = now_ts
         self._send(notification)
         return True
 
@@ -91,15 +124,17 @@ class Notifier:
         subject = f"[{notification.strategy}] {notification.label}"
         body = notification.message
         msg = body.encode("utf-8")
-        for recipient in self.mailing_list:
-            subprocess.run(
-                ["mail", "-s", subject, recipient],
-                input=msg,
-                check=True,
-            )
+        if not self.mailing_list:
+            return
+        # One `mail` process delivers to every recipient.
+        subprocess.run(
+            ["mail", "-s", subject, *self.mailing_list],
+            input=msg,
+            check=True,
+        )
 
     def close(self) -> None:
-        """Cleanly close the shelve database."""
+        """Cleanly close the notification log."""
         try:
             self._db.close()
         except Exception:
@@ -1,9 +1,11 @@
+import time
 from collections import defaultdict
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
+from functools import lru_cache
 from typing import DefaultDict
 from zoneinfo import ZoneInfo
 
-import pandas as pd
+import numpy as np
 import pandas_market_calendars as mcal
 
 EASTERN = ZoneInfo("America/New_York")
@@ -11,11 +13,28 @@ UTC = ZoneInfo("UTC")
 NYSE = mcal.get_calendar("NYSE")
 
 
+@lru_cache(maxsize=2)
+def _trading_days(until_year: int) -> np.ndarray:
+    """Sorted NYSE trading days from 1990 through the end of `until_year`."""
+    days = NYSE.valid_days(start_date="1990-01-01", end_date=f"{until_year}-12-31")
+    return days.tz_localize(None).values.astype("datetime64[D]")
+
+
+def _trading_day_position(day: date) -> tuple[np.ndarray, int | None]:
+    """Return the trading-day array covering `day` and its position in it, if any."""
+    days = _trading_days(day.year + 1)
+    key = np.datetime64(day, "D")
+    pos = int(np.searchsorted(days, key))
+    if pos < len(days) and days[pos] == key:
+        return days, pos
+    return days, None
+
+
 def is_trading_day(day: date) -> bool:
-    schedule = NYSE.schedule(start_date=day, end_date=day)
-    return not schedule.empty
+    return _trading_day_position(day)[1] is not None
 
 
+@lru_cache(maxsize=64)
 def get_market_schedule(day: date):
     schedule = NYSE.schedule(start_date=day, end_date=day)
     if schedule.empty:
@@ -25,46 +44,84 @@ def get_market_schedule(day: date):
     return open_dt, close_dt
 
 
-def market_is_open() -> bool:
-    now = datetime.now(EASTERN)
+def market_is_open_at(now: datetime) -> bool:
     if not is_trading_day(now.date()):
         return False
     open_dt, close_dt = get_market_schedule(now.date())
     return open_dt <= now <= close_dt
 
 
+# The open/closed state changes at most once per minute, so concurrent
+# requests can share one evaluation for a short while.
+MARKET_OPEN_TTL = 1.0
+_market_open_checked_at = float("-inf")
+_market_open = False
+
+
+def market_is_open() -> bool:
+    """Return whether NYSE is open now, re-evaluated at most once per TTL."""
+    global _market_open, _market_open_checked_at
+    checked_at = time.monotonic()
+    if checked_at - _market_open_checked_at >= MARKET_OPEN_TTL:
+        _market_open = market_is_open_at(datetime.now(EASTERN))
+        _market_open_checked_at = checked_at
+    return _market_open
+
+
+@lru_cache(maxsize=8)
+def _market_opens_from(start: date):
+    """NYSE open times (Eastern) for the two weeks starting at `start`."""
+    schedule = NYSE.schedule(start_date=start, end_date=start + timedelta(days=14))
+    return schedule["market_open"].dt.tz_convert(EASTERN)
+
+
+def next_market_open(now: datetime) -> datetime | None:
+    """Return the first NYSE open strictly after `now`, looking ahead two weeks."""
+    opens = _market_opens_from(now.date())
+    upcoming = opens[opens > now]
+    if upcoming.empty:
+        return None
+    return upcoming.iloc[0].to_pydatetime()
+
+
 def is_consecutive_trading_day(prev_day: date, current_day: date) -> bool:
     if prev_day >= current_day:
         return False
-    valid_days = NYSE.valid_days(start_date=prev_day, end_date=current_day).normalize()
-    valid_days = pd.DatetimeIndex(valid_days)
-
-    prev_ts, curr_ts = pd.Timestamp(prev_day), pd.Timestamp(current_day)
-    if prev_ts not in valid_days or curr_ts not in valid_days:
+    days, pos = _trading_day_position(prev_day)
+    if pos is None or pos + 1 >= len(days):
         return False
+    return days[pos + 1] == np.datetime64(current_day, "D")
+
 
-    try:
-        next_day = valid_days[valid_days.get_loc(prev_ts) + 1].date()
-        return next_day == current_day
-    except (IndexError, KeyError):
-        return False
+
+def previous_trading_day(day: date) -> date | None:
+    """Return the last NYSE trading day strictly before `day`."""
+    days = _trading_days(day.year + 1)
+    pos = int(np.searchsorted(days, np.datetime64(day, "D")))
+    if pos == 0:
+        return None
+    return days[pos - 1].astype(date)
+
+
+# Characters that are unsafe in file names on at least one platform
+_UNSAFE_SYMBOL_CHARS = str.maketrans("", "", '^/\\:*?"<>|')
 
 
 def sanitize_symbol(symbol: str) -> str:
     """Remove unsafe characters (e.g., '^') for filesystem use."""
-    return symbol.replace("^", "")
+    return symbol.translate(_UNSAFE_SYMBOL_CHARS)
 
 
 def format_analytics_payload(symbol: str, strategy: str, result: dict) -> dict:
     data = result.copy()
-    
+
+    # ISO 8601 strings start with the calendar date, so slicing replaces a
+    # parse/strftime round trip per point.
     if "dates" in data:
-        data["dates"] = [
-            datetime.fromisoformat(d).strftime("%Y-%m-%d") for d in data["dates"]
-        ]
+        data["dates"] = [d[:10] for d in data["dates"]]
 
     if "date" in data:
-        data["date"] = datetime.fromisoformat(data["date"]).strftime("%Y-%m-%d")
+        data["date"] = data["date"][:10]
 
     return {
         "symbol": symbol,
@@ -74,5 +131,15 @@ def format_analytics_payload(symbol: str, strategy: str, result: dict) -> dict:
     }
 
 
+def drop_last_bar(result: dict) -> None:
+    """Drop the in-progress bar from each list in a result's time series, in place."""
+    series = result.get("time_series", {})
+    result["time_series"] = {k: v for k, v in series.items() if isinstance(v, list)}
+    for values in result["time_series"].values():
+        del values[-1:]
+
+
+# Notifier state pickled by older versions references this factory, so it
+# must stay importable for the one-time shelve migration.
 def nested_defaultdict() -> DefaultDict[str, list]:
     return defaultdict(list)